@@ -0,0 +1,267 @@
+import logging
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from habr_parser import parse_count
+from query import QueryEngine
+
+TOP_TAGS = 200
+TOP_AUTHORS = 100
+TOP_PAIRS = 200
+TOP_TAGS_PER_WEEK = 10
+PERCENTILES = (0.5, 0.9)
+
+
+def encode(values, skip=None):
+    """Кодирует строки целыми числами через словарь (быстрее сортировки строк в np.unique).
+    Значение skip получает код -1"""
+    index = {skip: -1}
+    codes = np.fromiter((index.setdefault(v, len(index) - 1) for v in values), dtype=np.int64)
+    names = np.array(list(index)[1:], dtype=object)
+    return names, codes
+
+
+class ArticleColumns:
+    """Колоночное представление статей: числовые массивы и коды вместо строк"""
+
+    def __init__(self, articles):
+        self.size = len(articles)
+        self.days = np.array([a[0] for a in articles], dtype='datetime64[D]').astype(np.int64)
+        self.ratings = np.fromiter((parse_count(a[4]) for a in articles), dtype=np.int64, count=self.size)
+        self.comments = np.fromiter((parse_count(a[5]) for a in articles), dtype=np.int64, count=self.size)
+
+        self.author_names, self.author_codes = encode(a[3] for a in articles)
+
+        # Теги хранятся как CSR: tag_codes[tag_indptr[i]:tag_indptr[i + 1]] - теги статьи i.
+        # Все строки тегов режем одним split, номер статьи для каждого куска восстанавливаем по числу запятых
+        tag_strings = [a[6] for a in articles]
+        pieces = np.fromiter((s.count(',') + 1 for s in tag_strings), dtype=np.int64, count=self.size)
+        flat_tags = [t.strip() for t in ','.join(tag_strings).lower().split(',')] if self.size else []
+        piece_article = np.repeat(np.arange(self.size), pieces)
+        # Пустые куски (статья без тегов, лишние запятые) получают код -1 и отбрасываются
+        self.tag_names, piece_codes = encode(flat_tags, skip="")
+        keep = piece_codes >= 0
+
+        # Сортировка по (статья, тег) с удалением повторов тега внутри статьи
+        n_tags = max(len(self.tag_names), 1)
+        keys = np.unique(piece_article[keep] * n_tags + piece_codes[keep])
+        self.tag_article = keys // n_tags
+        self.tag_codes = keys % n_tags
+        self.tag_indptr = np.searchsorted(self.tag_article, np.arange(self.size + 1))
+
+
+def group_stats(codes, n_groups, values, percentiles=PERCENTILES):
+    """Количество, сумма и перцентили values по группам codes за один проход сортировки"""
+    counts = np.bincount(codes, minlength=n_groups)
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+
+    order = np.lexsort((values, codes))
+    sorted_values = values[order].astype(np.float64)
+    starts = np.zeros(n_groups, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+
+    result = {"count": counts, "sum": sums}
+    nonempty = counts > 0
+    for q in percentiles:
+        # Линейная интерполяция между соседними значениями внутри группы
+        pos = starts + q * np.maximum(counts - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        column = np.zeros(n_groups, dtype=np.float64)
+        if sorted_values.size:
+            lo_c = np.minimum(lo, sorted_values.size - 1)
+            hi_c = np.minimum(hi, sorted_values.size - 1)
+            interp = sorted_values[lo_c] + (sorted_values[hi_c] - sorted_values[lo_c]) * (pos - lo)
+            column[nonempty] = interp[nonempty]
+        result[q] = column
+    return result
+
+
+def average_ranks(values):
+    """Ранги значений, равные значения получают средний ранг своей группы"""
+    positions = np.empty(values.size, dtype=np.float64)
+    positions[np.argsort(values, kind="stable")] = np.arange(values.size)
+    _, groups = np.unique(values, return_inverse=True)
+    return (np.bincount(groups, weights=positions) / np.bincount(groups))[groups]
+
+
+def tag_cooccurrence(columns):
+    """Разреженная матрица совместной встречаемости тегов в формате COO (rows, cols, counts), rows < cols"""
+    n_tags = len(columns.tag_names)
+    if not columns.tag_codes.size:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+
+    # Раскладываем CSR в плотную матрицу статьи x позиция тега (у статьи не больше нескольких тегов)
+    per_article = np.diff(columns.tag_indptr)
+    width = int(per_article.max())
+    position = np.arange(columns.tag_codes.size) - columns.tag_indptr[columns.tag_article]
+    padded = np.full((columns.size, width), -1, dtype=np.int64)
+    padded[columns.tag_article, position] = columns.tag_codes
+
+    keys = []
+    for a in range(width):
+        for b in range(a + 1, width):
+            left, right = padded[:, a], padded[:, b]
+            both = (left >= 0) & (right >= 0)
+            lo = np.minimum(left[both], right[both])
+            hi = np.maximum(left[both], right[both])
+            keys.append(lo * n_tags + hi)
+
+    if not keys:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+
+    pair_keys, pair_counts = np.unique(np.concatenate(keys), return_counts=True)
+    return pair_keys // n_tags, pair_keys % n_tags, pair_counts
+
+
+def compute_analytics(columns):
+    """Считает агрегаты для панели аналитики по колонкам ArticleColumns.
+
+    Возвращает список таблиц (название, заголовки, строки, фильтры), где фильтр
+    строки - пара (вид, значение) для отбора статей в основной таблице.
+    """
+    if not columns.size:
+        return []
+    tables = []
+
+    # Теги: значения статей разворачиваем на каждое вхождение тега
+    n_tags = len(columns.tag_names)
+    if n_tags:
+        tag_ratings = group_stats(columns.tag_codes, n_tags, columns.ratings[columns.tag_article])
+        tag_comments = np.bincount(columns.tag_codes, weights=columns.comments[columns.tag_article],
+                                   minlength=n_tags)
+        top = np.argsort(-tag_ratings["count"], kind="stable")[:TOP_TAGS]
+        tables.append((
+            "Теги",
+            ["Тег", "Статей", "Сумма рейтинга", "Медиана рейтинга", "P90 рейтинга", "Комментариев"],
+            [[columns.tag_names[i], int(tag_ratings["count"][i]), int(tag_ratings["sum"][i]),
+              round(tag_ratings[0.5][i], 1), round(tag_ratings[0.9][i], 1), int(tag_comments[i])]
+             for i in top],
+            [("tag", str(columns.tag_names[i])) for i in top],
+        ))
+
+    n_authors = len(columns.author_names)
+    author_ratings = group_stats(columns.author_codes, n_authors, columns.ratings)
+    author_comments = np.bincount(columns.author_codes, weights=columns.comments, minlength=n_authors)
+    top = np.argsort(-author_ratings["sum"], kind="stable")[:TOP_AUTHORS]
+    tables.append((
+        "Авторы",
+        ["Автор", "Статей", "Сумма рейтинга", "Медиана рейтинга", "P90 рейтинга", "Комментариев"],
+        [[columns.author_names[i], int(author_ratings["count"][i]), int(author_ratings["sum"][i]),
+          round(author_ratings[0.5][i], 1), round(author_ratings[0.9][i], 1), int(author_comments[i])]
+         for i in top],
+        [("author", str(columns.author_names[i])) for i in top],
+    ))
+
+    first_day = int(columns.days.min())
+    day_codes = columns.days - first_day
+    n_days = int(day_codes.max()) + 1
+    day_ratings = group_stats(day_codes, n_days, columns.ratings)
+    day_comments = group_stats(day_codes, n_days, columns.comments)
+    days = [d for d in range(n_days) if day_ratings["count"][d]]
+    day_labels = {d: str(np.datetime64(first_day + d, 'D')) for d in days}
+    tables.append((
+        "По дням",
+        ["День", "Статей", "Сумма рейтинга", "Медиана рейтинга", "Комментариев", "Медиана комментариев"],
+        [[day_labels[d], int(day_ratings["count"][d]), int(day_ratings["sum"][d]),
+          round(day_ratings[0.5][d], 1), int(day_comments["sum"][d]), round(day_comments[0.5][d], 1)]
+         for d in days],
+        [("day", day_labels[d]) for d in days],
+    ))
+
+    if n_tags:
+        # Недели начинаются с понедельника: 1970-01-01 - четверг
+        weeks = (columns.days[columns.tag_article] + 3) // 7
+        first_week = int(weeks.min())
+        keys = (weeks - first_week) * n_tags + columns.tag_codes
+        week_keys, week_counts = np.unique(keys, return_counts=True)
+        week_idx, tag_idx = week_keys // n_tags, week_keys % n_tags
+        order = np.lexsort((-week_counts, week_idx))
+        rank = np.arange(order.size) - np.searchsorted(week_idx[order], week_idx[order])
+        order = order[rank < TOP_TAGS_PER_WEEK]
+        week_labels = [str(np.datetime64((first_week + int(w)) * 7 - 3, 'D')) for w in week_idx[order]]
+        tables.append((
+            "Теги по неделям",
+            ["Неделя с", "Тег", "Статей"],
+            [[label, columns.tag_names[tag_idx[i]], int(week_counts[i])]
+             for label, i in zip(week_labels, order)],
+            [("week", (label, str(columns.tag_names[tag_idx[i]]))) for label, i in zip(week_labels, order)],
+        ))
+
+        rows, cols, counts = tag_cooccurrence(columns)
+        top = np.argsort(-counts, kind="stable")[:TOP_PAIRS]
+        tables.append((
+            "Пары тегов",
+            ["Тег 1", "Тег 2", "Статей вместе"],
+            [[columns.tag_names[rows[i]], columns.tag_names[cols[i]], int(counts[i])] for i in top],
+            [("tags", f"{columns.tag_names[rows[i]]}, {columns.tag_names[cols[i]]}") for i in top],
+        ))
+
+    # Связь комментариев и рейтинга
+    if columns.size > 1 and columns.ratings.std() > 0 and columns.comments.std() > 0:
+        pearson = float(np.corrcoef(columns.ratings, columns.comments)[0, 1])
+        spearman = float(np.corrcoef(average_ranks(columns.ratings), average_ranks(columns.comments))[0, 1])
+    else:
+        pearson = spearman = 0.0
+
+    buckets = np.array([-np.inf, 0, 10, 25, 50, 100, np.inf])
+    bucket_labels = ["< 0", "0-9", "10-24", "25-49", "50-99", "100+"]
+    bucket_codes = np.searchsorted(buckets, columns.ratings, side="right") - 1
+    bucket_comments = group_stats(bucket_codes, len(bucket_labels), columns.comments)
+    rating_bounds = [(None, -1), (0, 9), (10, 24), (25, 49), (50, 99), (100, None)]
+    nonempty = [b for b in range(len(bucket_labels)) if bucket_comments["count"][b]]
+    tables.append((
+        f"Комментарии и рейтинг (Пирсон {pearson:.2f}, Спирмен {spearman:.2f})",
+        ["Рейтинг", "Статей", "Среднее комментариев", "Медиана комментариев", "P90 комментариев"],
+        [[bucket_labels[b], int(bucket_comments["count"][b]),
+          round(bucket_comments["sum"][b] / bucket_comments["count"][b], 1),
+          round(bucket_comments[0.5][b], 1), round(bucket_comments[0.9][b], 1)]
+         for b in nonempty],
+        [("rating", rating_bounds[b]) for b in nonempty],
+    ))
+
+    return tables
+
+
+class AnalyticsWorker(QObject):
+    analytics_ready = pyqtSignal(list)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger("Analytics")
+
+    def compute(self, columns):
+        try:
+            self.analytics_ready.emit(compute_analytics(columns))
+        except Exception as e:
+            self.logger.error(f"Ошибка расчёта аналитики: {str(e)}")
+            self.error_occurred.emit(f"Ошибка расчёта аналитики: {str(e)}")
+
+
+def tag_index_from_columns(columns):
+    """Индекс тег -> номера статей, собранный из CSR-кодов тегов"""
+    order = np.argsort(columns.tag_codes, kind="stable")
+    bounds = np.cumsum(np.bincount(columns.tag_codes, minlength=len(columns.tag_names)))[:-1]
+    groups = np.split(columns.tag_article[order], bounds)
+    return {str(name): rows.tolist() for name, rows in zip(columns.tag_names, groups)}
+
+
+class ColumnsWorker(QObject):
+    """Строит колонки, движок запросов и индекс тегов вне GUI-потока"""
+    columns_ready = pyqtSignal(int, object, object)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger("Analytics")
+
+    def build(self, generation, articles):
+        try:
+            columns = ArticleColumns(articles)
+            self.columns_ready.emit(generation, QueryEngine(columns), tag_index_from_columns(columns))
+        except Exception as e:
+            self.logger.error(f"Ошибка подготовки данных для фильтров: {str(e)}")
+            self.error_occurred.emit(f"Ошибка подготовки данных для фильтров: {str(e)}")
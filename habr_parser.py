@@ -2,13 +2,35 @@ import requests
 from bs4 import BeautifulSoup
 import logging
 from datetime import datetime
-from time import sleep
 from random import randint
+from threading import Event, Thread
 from PyQt5.QtCore import QObject, pyqtSignal
 
+# Как часто ожидающий ответа поток проверяет запрос на остановку
+CANCEL_POLL_INTERVAL = 0.1
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+
+class ParsingCancelled(Exception):
+    pass
+
+
+def parse_count(text):
+    """Переводит значение рейтинга/счётчика со страницы в int"""
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    text = text.strip().replace('\u2212', '-').replace('\u2013', '-').replace(' ', '')
+    try:
+        return int(text)
+    except ValueError:
+        return 0
+
 
 class HabrParser(QObject):
     parsing_finished = pyqtSignal(list, list)
+    refresh_finished = pyqtSignal(dict, int)
     progress_updated = pyqtSignal(int)
     error_occurred = pyqtSignal(str)
 
@@ -19,12 +41,74 @@ class HabrParser(QObject):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
             "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7"
         }
-        self.stop_parsing = False
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self._stop_event = Event()
+        self.session = self.new_session()
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger("HabrParser")
 
+    @property
+    def stop_parsing(self):
+        return self._stop_event.is_set()
+
+    @stop_parsing.setter
+    def stop_parsing(self, value):
+        if value:
+            self._stop_event.set()
+        else:
+            self._stop_event.clear()
+
+    def wait(self, seconds):
+        """Пауза, прерываемая запросом на остановку. Возвращает True, если парсинг остановлен"""
+        return self._stop_event.wait(seconds)
+
+    def new_session(self):
+        session = requests.Session()
+        session.headers.update(self.headers)
+        return session
+
+    def fetch_text(self, url, timeout=15):
+        """Загружает страницу, прерываясь по запросу на остановку.
+
+        Запрос выполняется в daemon-потоке: ожидание ответа от сервера прервать нельзя,
+        поэтому при остановке поток бросается, а тело ответа читается порциями
+        с проверкой остановки между ними."""
+        if self._stop_event.is_set():
+            raise ParsingCancelled()
+
+        session = self.session
+        result = {}
+        done = Event()
+
+        def run():
+            try:
+                result["text"] = self._read_response(session, url, timeout)
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        Thread(target=run, daemon=True).start()
+        while not done.wait(CANCEL_POLL_INTERVAL):
+            if self._stop_event.is_set():
+                raise ParsingCancelled()
+
+        if "error" in result:
+            raise result["error"]
+        return result["text"]
+
+    def _read_response(self, session, url, timeout):
+        response = session.get(url, timeout=timeout, stream=True)
+        try:
+            response.raise_for_status()
+            chunks = []
+            for chunk in response.iter_content(RESPONSE_CHUNK_SIZE):
+                if self._stop_event.is_set():
+                    raise ParsingCancelled()
+                chunks.append(chunk)
+            return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+        finally:
+            response.close()
+
     def parse_habr(self, start_date, end_date, max_articles=None):
         self.stop_parsing = False
         all_articles = []
@@ -78,29 +162,55 @@ class HabrParser(QObject):
                         break
 
                 page += 1
-                sleep(randint(1, 3))
+                self.wait(randint(1, 3))
 
             except Exception as e:
                 self.logger.error(f"Ошибка при парсинге страницы {page}: {str(e)}")
                 self.error_occurred.emit(f"Ошибка при парсинге страницы {page}: {str(e)}")
-                sleep(randint(5, 10))
+                self.wait(randint(5, 10))
                 continue
 
         self.progress_updated.emit(100)
         self.logger.info(f"Парсинг завершен. Найдено {len(all_articles)} статей.")
         self.parsing_finished.emit(all_articles, all_tags)
 
-    def parse_page(self, page_num, start_date, end_date):
-        try:
-            url = f"{self.base_url}/ru/all/page{page_num}/"
-            response = self.session.get(url, timeout=15)
-            response.raise_for_status()
+    def fetch_listing(self, page_num):
+        url = f"{self.base_url}/ru/all/page{page_num}/"
+        text = self.fetch_text(url, timeout=15)
 
-            if "404 Not Found" in response.text:
-                return [], [], False
+        if "404 Not Found" in text:
+            return []
+
+        soup = BeautifulSoup(text, 'html.parser')
+        return soup.find_all("article", class_="tm-articles-list__item")
+
+    def parse_listing_item(self, article):
+        date_tag = article.find("time")
+        if not date_tag:
+            return None
+
+        title_tag = article.find("h2")
+        if not title_tag:
+            return None
+
+        article_date = date_tag["datetime"].split("T")[0]
+        title = title_tag.text.strip()
+        link = self.base_url + title_tag.find("a")["href"]
+
+        author = article.find("a", class_="tm-user-info__username")
+        author = author.text.strip() if author else "Нет автора"
+
+        rating = article.find("span", class_="tm-votes-meter__value")
+        rating = rating.text.strip() if rating else "0"
+
+        comments = article.find("span", class_="tm-article-comments-counter-link__value")
+        comments = comments.text.strip() if comments else "0"
+
+        return [article_date, title, link, author, rating, comments]
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            articles = soup.find_all("article", class_="tm-articles-list__item")
+    def parse_page(self, page_num, start_date, end_date):
+        try:
+            articles = self.fetch_listing(page_num)
 
             if not articles:
                 return [], [], False
@@ -114,42 +224,31 @@ class HabrParser(QObject):
                     break
 
                 try:
-                    date_tag = article.find("time")
-                    if not date_tag:
+                    item = self.parse_listing_item(article)
+                    if not item:
                         continue
 
-                    article_date = date_tag["datetime"].split("T")[0]
+                    article_date = item[0]
                     if article_date < start_date or article_date > end_date:
                         continue
 
-                    title_tag = article.find("h2")
-                    if not title_tag:
-                        continue
-
-                    title = title_tag.text.strip()
-                    link = self.base_url + title_tag.find("a")["href"]
-
-                    author = article.find("a", class_="tm-user-info__username")
-                    author = author.text.strip() if author else "Нет автора"
+                    description, tags = self.get_article_data(item[2])
 
-                    rating = article.find("span", class_="tm-votes-meter__value")
-                    rating = rating.text.strip() if rating else "0"
-
-                    comments = article.find("span", class_="tm-article-comments-counter-link__value")
-                    comments = comments.text.strip() if comments else "0"
-
-                    description, tags = self.get_article_data(link)
-
-                    page_data.append([article_date, title, link, author, rating, comments, tags, description])
+                    page_data.append(item + [tags, description])
                     page_tags.append(tags)
                     has_valid_content = True
 
+                except ParsingCancelled:
+                    # Отдаём уже собранные статьи страницы
+                    break
                 except Exception as e:
                     self.logger.warning(f"Ошибка обработки статьи: {str(e)}")
                     continue
 
             return page_data, page_tags, has_valid_content
 
+        except ParsingCancelled:
+            return [], [], False
         except requests.RequestException as e:
             self.logger.error(f"Ошибка запроса для страницы {page_num}: {str(e)}")
             return [], [], False
@@ -157,12 +256,66 @@ class HabrParser(QObject):
             self.logger.error(f"Неожиданная ошибка при парсинге страницы {page_num}: {str(e)}")
             return [], [], False
 
+    def refresh_metrics(self, known_links, since_date, max_pages=100):
+        """Перечитывает только страницы списка и собирает рейтинг/комментарии
+        для уже известных статей, не открывая сами статьи"""
+        self.stop_parsing = False
+        pending = set(known_links)
+        metrics = {}
+        page = 1
+
+        while not self.stop_parsing and pending and page <= max_pages:
+            try:
+                self.logger.info(f"Обновление метрик, страница {page}...")
+                articles = self.fetch_listing(page)
+                if not articles:
+                    break
+
+                earliest_date = None
+                for article in articles:
+                    try:
+                        item = self.parse_listing_item(article)
+                    except Exception as e:
+                        self.logger.warning(f"Ошибка обработки статьи: {str(e)}")
+                        continue
+                    if not item:
+                        continue
+
+                    article_date, link = item[0], item[2]
+                    if earliest_date is None or article_date < earliest_date:
+                        earliest_date = article_date
+
+                    if link in pending:
+                        metrics[link] = (item[4], item[5])
+                        pending.discard(link)
+
+                total = len(metrics) + len(pending)
+                self.progress_updated.emit(min(99, int(len(metrics) / total * 100)) if total else 99)
+
+                if earliest_date is not None and earliest_date < since_date:
+                    break
+
+                page += 1
+                self.wait(randint(1, 3))
+
+            except ParsingCancelled:
+                break
+            except Exception as e:
+                self.logger.error(f"Ошибка при обновлении страницы {page}: {str(e)}")
+                self.error_occurred.emit(f"Ошибка при обновлении страницы {page}: {str(e)}")
+                self.wait(randint(5, 10))
+                page += 1
+                continue
+
+        self.progress_updated.emit(100)
+        self.logger.info(f"Обновление завершено. Обновлено {len(metrics)} статей, не найдено {len(pending)}.")
+        self.refresh_finished.emit(metrics, len(pending))
+
     def get_article_data(self, article_url):
         try:
-            response = self.session.get(article_url, timeout=15)
-            response.raise_for_status()
+            text = self.fetch_text(article_url, timeout=15)
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(text, 'html.parser')
 
             body = soup.find("div", class_="tm-article-body")
             if body:
@@ -178,6 +331,8 @@ class HabrParser(QObject):
 
             return description, ", ".join(tags)
 
+        except ParsingCancelled:
+            raise
         except requests.RequestException as e:
             self.logger.warning(f"Ошибка запроса для статьи {article_url}: {str(e)}")
             return "Ошибка загрузки", ""
@@ -187,4 +342,8 @@ class HabrParser(QObject):
 
     def stop(self):
         self.stop_parsing = True
+        # Брошенный запрос дорабатывает на старой сессии, следующий парсинг получает новую:
+        # requests.Session нельзя использовать из нескольких потоков одновременно
+        old_session, self.session = self.session, self.new_session()
+        old_session.close()
         self.logger.info("Получен запрос на остановку парсинга")
@@ -1,17 +1,28 @@
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout,
                              QWidget, QLabel, QLineEdit, QPushButton, QSpinBox,
-                             QTableWidget, QTableWidgetItem, QHeaderView, QProgressBar,
+                             QTableView, QAbstractItemView, QHeaderView, QProgressBar,
                              QComboBox, QFileDialog, QMessageBox, QCompleter, QDialog)
-from PyQt5.QtCore import QDate, Qt, QObject, pyqtSignal, QStringListModel
+from PyQt5.QtCore import QDate, Qt, QObject, pyqtSignal, QStringListModel, QTimer
 from PyQt5.QtGui import QFont, QValidator
 from datetime import datetime
+import os
 import sys
 import csv
 import re
+import logging
+import time
+import webbrowser
 from threading import Thread
 
-from habr_parser import HabrParser
-from ui_components import ClickableTableWidgetItem, DatePickerDialog
+from analytics import AnalyticsWorker, ColumnsWorker
+from habr_parser import HabrParser, parse_count
+from query import ArticleQuery
+from session_store import default_snapshot_path, load_snapshot, save_snapshot, SnapshotError
+from ui_components import AnalyticsDialog, ArticlesTableModel, DatePickerDialog
+
+AUTOSAVE_INTERVAL_MS = 5 * 60 * 1000
+FILTER_SPIN_MIN = -10000
+FILTER_SPIN_MAX = 100000
 
 
 class DateValidator(QValidator):
@@ -35,14 +46,32 @@ class HabrParserApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.parser = HabrParser()
+        self.analytics_worker = AnalyticsWorker()
+        self.analytics_dialog = None
+        self.analytics_pending = False
+        self.columns_worker = ColumnsWorker()
+        self.columns_generation = 0
+        self.metrics_pending_since = None
         self.articles_data = []
         self.all_tags = set()
+        self.tag_index = {}
+        self.metrics_history = {}
+        self.article_columns = None
+        self.query_engine = None
         self.is_parsing = False
+        self.session_dirty = False
+        self.snapshot_path = default_snapshot_path()
+        self.logger = logging.getLogger("HabrParserApp")
         self.setWindowTitle("Habr Crawler")
         self.setGeometry(100, 100, 1600, 1080)
         self.init_ui()
         self.parser_thread = None
 
+        self.load_session()
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.save_session)
+        self.autosave_timer.start(AUTOSAVE_INTERVAL_MS)
+
     def init_ui(self):
         # Установка основного шрифта
         font = QFont()
@@ -151,6 +180,16 @@ class HabrParserApp(QMainWindow):
         self.stop_btn.setMinimumWidth(150)
         self.stop_btn.setEnabled(False)
 
+        self.refresh_btn = QPushButton("Обновить метрики")
+        self.refresh_btn.setFixedHeight(40)
+        self.refresh_btn.setMinimumWidth(150)
+        self.refresh_btn.setEnabled(False)
+
+        self.analytics_btn = QPushButton("Аналитика")
+        self.analytics_btn.setFixedHeight(40)
+        self.analytics_btn.setMinimumWidth(150)
+        self.analytics_btn.setEnabled(False)
+
         self.sort_combo = QComboBox()
         self.sort_combo.addItems(["Сортировка", "Дата (старые)", "Дата (новые)", "Рейтинг", "Комментарии"])
         self.sort_combo.setFixedHeight(40)
@@ -159,21 +198,75 @@ class HabrParserApp(QMainWindow):
         button_panel.addWidget(self.export_btn)
         button_panel.addWidget(self.reset_filter_btn)
         button_panel.addWidget(self.stop_btn)
+        button_panel.addWidget(self.refresh_btn)
+        button_panel.addWidget(self.analytics_btn)
         button_panel.addWidget(self.sort_combo)
 
+        # Панель фильтров
+        filter_panel = QHBoxLayout()
+        filter_panel.setSpacing(10)
+
+        filter_panel.addWidget(QLabel("Период:"))
+        self.filter_from_edit = QLineEdit()
+        self.filter_from_edit.setPlaceholderText("дд.мм.гггг")
+        self.filter_from_edit.setFixedHeight(35)
+        self.filter_from_edit.setFixedWidth(120)
+        self.filter_from_edit.setValidator(DateValidator())
+        filter_panel.addWidget(self.filter_from_edit)
+        filter_panel.addWidget(QLabel("—"))
+        self.filter_to_edit = QLineEdit()
+        self.filter_to_edit.setPlaceholderText("дд.мм.гггг")
+        self.filter_to_edit.setFixedHeight(35)
+        self.filter_to_edit.setFixedWidth(120)
+        self.filter_to_edit.setValidator(DateValidator())
+        filter_panel.addWidget(self.filter_to_edit)
+
+        # Минимальное значение спинбокса означает "без ограничения"
+        filter_panel.addWidget(QLabel("Рейтинг от:"))
+        self.rating_min_spin = QSpinBox()
+        self.rating_min_spin.setRange(FILTER_SPIN_MIN, FILTER_SPIN_MAX)
+        self.rating_min_spin.setSpecialValueText("Любой")
+        self.rating_min_spin.setValue(FILTER_SPIN_MIN)
+        self.rating_min_spin.setFixedHeight(35)
+        self.rating_min_spin.setFixedWidth(100)
+        filter_panel.addWidget(self.rating_min_spin)
+
+        filter_panel.addWidget(QLabel("до:"))
+        self.rating_max_spin = QSpinBox()
+        self.rating_max_spin.setRange(FILTER_SPIN_MIN, FILTER_SPIN_MAX)
+        self.rating_max_spin.setSpecialValueText("Любой")
+        self.rating_max_spin.setValue(FILTER_SPIN_MIN)
+        self.rating_max_spin.setFixedHeight(35)
+        self.rating_max_spin.setFixedWidth(100)
+        filter_panel.addWidget(self.rating_max_spin)
+
+        filter_panel.addWidget(QLabel("Комментарии от:"))
+        self.comments_min_spin = QSpinBox()
+        self.comments_min_spin.setRange(0, FILTER_SPIN_MAX)
+        self.comments_min_spin.setSpecialValueText("Любые")
+        self.comments_min_spin.setValue(0)
+        self.comments_min_spin.setFixedHeight(35)
+        self.comments_min_spin.setFixedWidth(100)
+        filter_panel.addWidget(self.comments_min_spin)
+
+        filter_panel.addWidget(QLabel("Авторы:"))
+        self.authors_edit = QLineEdit()
+        self.authors_edit.setPlaceholderText("через запятую")
+        self.authors_edit.setFixedHeight(35)
+        filter_panel.addWidget(self.authors_edit, stretch=1)
+
         # Прогресс-бар
         self.progress = QProgressBar()
         self.progress.setFixedHeight(25)
         self.progress.setVisible(False)
 
         # Таблица
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels(
-            ["Дата", "Заголовок", "Ссылка", "Автор", "Рейтинг", "Комментарии", "Теги", "Краткое содержание"])
+        self.table_model = ArticlesTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
 
         header = self.table.horizontalHeader()
-        for i in range(self.table.columnCount()):
+        for i in range(self.table_model.columnCount()):
             header.setSectionResizeMode(i, QHeaderView.Interactive)
 
         # Задаём стартовые ширины
@@ -189,8 +282,8 @@ class HabrParserApp(QMainWindow):
         # Последний столбец будет растягиваться, если есть место
         self.table.horizontalHeader().setStretchLastSection(True)
 
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.cellDoubleClicked.connect(self.cell_double_clicked)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.doubleClicked.connect(self.cell_double_clicked)
 
         # Установка стилей
         self.setStyleSheet("""
@@ -220,7 +313,7 @@ class HabrParserApp(QMainWindow):
             QPushButton:disabled {
                 background-color: #b0b0b0;
             }
-            QTableWidget {
+            QTableView {
                 font-size: 13px;
                 alternate-background-color: #f9f9f9;
             }
@@ -243,6 +336,7 @@ class HabrParserApp(QMainWindow):
         # Сборка интерфейса
         main_layout.addLayout(control_panel)
         main_layout.addLayout(button_panel)
+        main_layout.addLayout(filter_panel)
         main_layout.addWidget(self.progress)
         main_layout.addWidget(self.table)
 
@@ -254,14 +348,40 @@ class HabrParserApp(QMainWindow):
         self.export_btn.clicked.connect(self.export_to_csv)
         self.reset_filter_btn.clicked.connect(self.reset_filters)
         self.stop_btn.clicked.connect(self.stop_parsing)
-        self.sort_combo.currentIndexChanged.connect(self.sort_table)
-        self.tag_search.currentTextChanged.connect(self.filter_by_tag)
+        self.refresh_btn.clicked.connect(self.start_refresh)
+        self.analytics_btn.clicked.connect(self.show_analytics)
+
+        # Изменения фильтров собираются таймером и применяются одним пересчётом
+        self.query_timer = QTimer(self)
+        self.query_timer.setSingleShot(True)
+        self.query_timer.setInterval(0)
+        self.query_timer.timeout.connect(self.apply_query)
+        self.sort_combo.currentIndexChanged.connect(self.schedule_query)
+        self.tag_search.currentTextChanged.connect(self.schedule_query)
+        self.filter_from_edit.textChanged.connect(self.schedule_query)
+        self.filter_to_edit.textChanged.connect(self.schedule_query)
+        self.rating_min_spin.valueChanged.connect(self.schedule_query)
+        self.rating_max_spin.valueChanged.connect(self.schedule_query)
+        self.comments_min_spin.valueChanged.connect(self.schedule_query)
+        self.authors_edit.textChanged.connect(self.schedule_query)
 
         # Подключение сигналов парсера
         self.parser.parsing_finished.connect(self.on_parsing_finished)
+        self.parser.refresh_finished.connect(self.on_refresh_finished)
         self.parser.progress_updated.connect(self.progress.setValue)
         self.parser.error_occurred.connect(self.show_error)
 
+        # Подключение сигналов аналитики
+        self.analytics_worker.analytics_ready.connect(self.on_analytics_ready)
+        self.analytics_worker.error_occurred.connect(self.on_analytics_error)
+        self.columns_worker.columns_ready.connect(self.on_columns_ready)
+        self.columns_worker.error_occurred.connect(self.on_columns_error)
+
+        # Фильтры отключаются на время парсинга, чтобы не вернуть в таблицу прошлые данные
+        self.filter_widgets = [self.filter_from_edit, self.filter_to_edit, self.rating_min_spin,
+                               self.rating_max_spin, self.comments_min_spin, self.authors_edit,
+                               self.sort_combo, self.reset_filter_btn]
+
         self.export_btn.setEnabled(False)
 
         # Установка дат по умолчанию
@@ -309,11 +429,21 @@ class HabrParserApp(QMainWindow):
 
             self.is_parsing = True
             self.parse_btn.setEnabled(False)
+            self.refresh_btn.setEnabled(False)
             self.stop_btn.setEnabled(True)
             self.progress.setVisible(True)
             self.tag_search.setEnabled(False)
-
-            self.table.setRowCount(0)
+            self.set_filters_enabled(False)
+            self.export_btn.setEnabled(False)
+            self.analytics_btn.setEnabled(False)
+
+            # Отключаем прошлые данные от таблицы: без движка apply_query и фильтры
+            # из окна аналитики ничего не показывают, а недостроенные колонки отбрасываются
+            self.query_engine = None
+            self.article_columns = None
+            self.analytics_pending = False
+            self.columns_generation += 1
+            self.table_model.set_rows([], [])
             self.parser.stop_parsing = False
 
             self.parser_thread = Thread(
@@ -327,174 +457,362 @@ class HabrParserApp(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Проверьте правильность введённых дат (дд.мм.гггг)")
 
     def stop_parsing(self):
+        # Поток парсера прерывает ожидание сам и сразу отдаёт собранные статьи
+        # через parsing_finished/refresh_finished, поэтому здесь его не ждём
         if self.is_parsing:
             self.parser.stop()
-            if self.parser_thread and self.parser_thread.is_alive():
-                self.parser_thread.join(timeout=1)
-            self.is_parsing = False
-            self.parse_btn.setEnabled(True)
             self.stop_btn.setEnabled(False)
-            self.progress.setValue(0)
 
-    def on_parsing_finished(self, articles_data, tags):
-        self.is_parsing = False
-        self.articles_data = articles_data
-        self.all_tags = set()
+    def start_refresh(self):
+        if self.is_parsing or not self.articles_data:
+            return
 
-        for tag_list in tags:
-            self.all_tags.update(t.strip().lower() for t in tag_list.split(','))
+        self.parser.stop_parsing = False
 
-        self.tag_completer_model = QStringListModel(sorted(self.all_tags))
-        self.tag_completer.setModel(self.tag_completer_model)
+        known_links = [article[2] for article in self.articles_data]
+        since_date = min(article[0] for article in self.articles_data)
 
-        self.tag_search.setEnabled(True)
-        self.tag_search.setPlaceholderText("Введите теги...")
-        self.tag_search.clear()
-        self.tag_search.addItem("")
-        self.tag_search.addItems(sorted(self.all_tags))
+        self.is_parsing = True
+        self.parse_btn.setEnabled(False)
+        self.refresh_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.progress.setVisible(True)
+        self.progress.setValue(0)
+
+        self.parser_thread = Thread(
+            target=self.parser.refresh_metrics,
+            args=(known_links, since_date),
+            daemon=True
+        )
+        self.parser_thread.start()
+
+    def on_refresh_finished(self, metrics, not_found):
+        self.is_parsing = False
+        timestamp = time.time()
+        changed = set()
 
         for article in self.articles_data:
-            row = self.table.rowCount()
-            self.table.insertRow(row)
+            link = article[2]
+            if link not in metrics:
+                continue
 
-            formatted_date = datetime.strptime(article[0], "%Y-%m-%d").strftime("%d.%m.%Y")
-            self.table.setItem(row, 0, QTableWidgetItem(formatted_date))
+            rating, comments = metrics[link]
+            self.metrics_history.setdefault(link, []).append(
+                (timestamp, parse_count(rating), parse_count(comments)))
 
-            title_item = QTableWidgetItem(article[1])
-            title_item.setToolTip(article[1])
-            self.table.setItem(row, 1, title_item)
+            if (rating, comments) != (article[4], article[5]):
+                article[4], article[5] = rating, comments
+                changed.add(link)
 
-            self.table.setItem(row, 2, ClickableTableWidgetItem(article[2], article[2]))
+        # Статьи обновлены на месте, модель лишь перерисовывает строки с подсветкой
+        self.table_model.set_highlighted(changed)
+        if changed:
+            # Таблица пересчитается, когда будут готовы новые колонки
+            self.update_columns()
 
-            self.table.setItem(row, 3, QTableWidgetItem(article[3]))
+        if metrics:
+            self.session_dirty = True
 
-            rating = QTableWidgetItem(article[4])
-            rating.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, 4, rating)
+        self.progress.setValue(100)
+        self.parse_btn.setEnabled(True)
+        self.refresh_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.parser_thread = None
 
-            comments = QTableWidgetItem(article[5])
-            comments.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, 5, comments)
+        if not_found:
+            QMessageBox.information(
+                self, "Обновление метрик",
+                f"Обновлено статей: {len(metrics)}. Не найдено в ленте: {not_found} "
+                f"(слишком старые или обновление было остановлено).")
 
-            cleaned_tags = ', '.join(t.strip() for t in article[6].split(','))
-            tag_item = QTableWidgetItem(cleaned_tags)
-            tag_item.setToolTip(cleaned_tags)
-            self.table.setItem(row, 6, tag_item)
+    def record_metrics(self, timestamp, columns):
+        # Рейтинг и комментарии уже разобраны в колонках, повторно строки не парсим
+        links = (article[2] for article in self.articles_data)
+        for link, rating, comments in zip(links, columns.ratings.tolist(), columns.comments.tolist()):
+            self.metrics_history.setdefault(link, []).append((timestamp, rating, comments))
 
-            full_desc = article[7]
-            short_desc = (full_desc[:150] + '...') if len(full_desc) > 150 else full_desc
-            desc_item = QTableWidgetItem(short_desc)
-            desc_item.setToolTip(full_desc)
-            desc_item.setData(Qt.UserRole, full_desc)
-            self.table.setItem(row, 7, desc_item)
+    def on_parsing_finished(self, articles_data, tags):
+        self.is_parsing = False
+        self.table_model.set_highlighted(set())
+        # Первая точка истории метрик запишется, когда будут готовы колонки
+        self.metrics_pending_since = time.time()
+        self.set_articles(articles_data)
+        self.session_dirty = True
 
         self.progress.setValue(100)
         self.parse_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
-        self.export_btn.setEnabled(True)
         self.parser_thread = None
 
-    def show_error(self, message):
+    def set_articles(self, articles_data, tag_index=None):
+        self.articles_data = articles_data
+        # Без готового индекса (после парсинга) теги появятся вместе с колонками
+        self.set_tags(tag_index if tag_index is not None else {})
+
+        # Пока колонки строятся в фоне, показываем статьи без фильтра
+        self.query_engine = None
+        self.article_columns = None
+        self.table_model.set_rows(self.articles_data, range(len(self.articles_data)))
+        self.update_columns()
+        self.set_filters_enabled(True)
+        self.export_btn.setEnabled(bool(self.articles_data))
+        self.refresh_btn.setEnabled(bool(self.articles_data))
+        self.analytics_btn.setEnabled(bool(self.articles_data))
+
+    def set_tags(self, tag_index, keep_filter=False):
+        self.tag_index = tag_index
+        self.all_tags = set(self.tag_index)
+        current_tags = self.tag_search.currentText() if keep_filter else ""
+
+        self.tag_completer_model = QStringListModel(sorted(self.all_tags))
+        self.tag_completer.setModel(self.tag_completer_model)
+
+        self.tag_search.blockSignals(True)
+        self.tag_search.setEnabled(True)
+        self.tag_search.setPlaceholderText("Введите теги...")
+        self.tag_search.clear()
+        self.tag_search.addItem("")
+        self.tag_search.addItems(sorted(self.all_tags))
+        self.tag_search.setEditText(current_tags)
+        self.tag_search.blockSignals(False)
+
+    def update_columns(self):
+        # Колонки и кеш масок зависят от значений статей, поэтому строятся заново в фоне;
+        # результат устаревшей сборки отбрасывается по номеру поколения
+        self.columns_generation += 1
+        Thread(
+            target=self.columns_worker.build,
+            args=(self.columns_generation, self.articles_data),
+            daemon=True
+        ).start()
+
+    def on_columns_ready(self, generation, engine, tag_index):
+        if generation != self.columns_generation:
+            return
+
+        if tag_index != self.tag_index:
+            self.set_tags(tag_index, keep_filter=True)
+        self.query_engine = engine
+        self.article_columns = engine.columns
+        self.apply_query()
+
+        if self.metrics_pending_since is not None:
+            self.record_metrics(self.metrics_pending_since, engine.columns)
+            self.metrics_pending_since = None
+
+        if self.analytics_pending:
+            self.analytics_pending = False
+            self.start_analytics()
+
+    def on_columns_error(self, message):
         QMessageBox.warning(self, "Ошибка", message)
-        self.is_parsing = False
-        self.parse_btn.setEnabled(True)
-        self.stop_btn.setEnabled(False)
-        self.progress.setValue(0)
 
-    def cell_double_clicked(self, row, col):
-        if col == 2:
-            item = self.table.item(row, col)
-            if isinstance(item, ClickableTableWidgetItem):
-                item.open_link()
-        elif col == 7:
-            item = self.table.item(row, col)
-            if item:
-                full_text = item.data(Qt.UserRole)
-                if full_text:
-                    QMessageBox.information(self, "Краткое содержание статьи", full_text)
-
-    def filter_by_tag(self, tag):
-        tag = tag.strip().lower()
-        for row in range(self.table.rowCount()):
-            tags_item = self.table.item(row, 6)
-            if not tag:
-                self.table.setRowHidden(row, False)
-            elif tags_item:
-                article_tags = [t.strip().lower() for t in tags_item.text().split(',')]
-                self.table.setRowHidden(row, tag not in article_tags)
-            else:
-                self.table.setRowHidden(row, True)
+    def set_filters_enabled(self, enabled):
+        for widget in self.filter_widgets:
+            widget.setEnabled(enabled)
+
+    def current_query(self):
+        return ArticleQuery(
+            date_from=self.filter_date(self.filter_from_edit),
+            date_to=self.filter_date(self.filter_to_edit),
+            rating_min=self.filter_value(self.rating_min_spin),
+            rating_max=self.filter_value(self.rating_max_spin),
+            comments_min=self.filter_value(self.comments_min_spin),
+            authors=self.authors_edit.text().split(','),
+            tags=self.tag_search.currentText().split(','),
+        )
 
-    def reset_filters(self):
-        self.tag_search.setCurrentIndex(0)
-        self.sort_combo.setCurrentIndex(0)
-        for row in range(self.table.rowCount()):
-            self.table.setRowHidden(row, False)
+    def filter_date(self, edit):
+        date = QDate.fromString(edit.text(), "dd.MM.yyyy")
+        return date.toString("yyyy-MM-dd") if date.isValid() else None
 
-    def sort_table(self, index):
-        if not self.articles_data:
+    def filter_value(self, spin):
+        return None if spin.value() == spin.minimum() else spin.value()
+
+    def schedule_query(self, *args):
+        self.session_dirty = True
+        self.query_timer.start()
+
+    def apply_query(self):
+        if self.query_engine is None:
             return
 
-        # Для обычной сортировки дат используем встроенные методы
-        if index == 1:
-            self.table.sortItems(0, Qt.DescendingOrder)
+        rows = self.query_engine.rows(self.current_query(), self.sort_combo.currentIndex())
+        self.table_model.set_rows(self.articles_data, rows)
+
+    def load_session(self):
+        if not os.path.exists(self.snapshot_path):
             return
-        elif index == 2:
-            self.table.sortItems(0, Qt.AscendingOrder)
+
+        try:
+            articles, tag_index, state, metrics_history = load_snapshot(self.snapshot_path)
+        except (OSError, ValueError, KeyError, SnapshotError) as e:
+            self.logger.warning(f"Не удалось загрузить снимок сессии: {e}")
             return
 
-        # Для рейтинга и комментариев - кастомная сортировка
-        col = 4 if index == 3 else 5  # 4 - рейтинг, 5 - комментарии
+        if not articles:
+            return
 
-        # Собираем данные строк
-        rows_data = []
-        for row in range(self.table.rowCount()):
-            if self.table.isRowHidden(row):
-                continue
+        self.metrics_history = metrics_history
+        self.set_articles(articles, tag_index)
+
+        # Восстанавливаем сортировку и фильтры прошлой сессии.
+        # Значения из файла не проверены, неподходящие заменяются значениями по умолчанию
+        def restored(key, default):
+            value = state.get(key, default)
+            return value if type(value) is type(default) else default
+
+        sort_index = restored("sort_index", 0)
+        if 0 < sort_index < self.sort_combo.count():
+            self.sort_combo.setCurrentIndex(sort_index)
+        self.tag_search.setEditText(restored("tag_filter", ""))
+        self.filter_from_edit.setText(restored("filter_from", ""))
+        self.filter_to_edit.setText(restored("filter_to", ""))
+        for spin, key in ((self.rating_min_spin, "rating_min"), (self.rating_max_spin, "rating_max"),
+                          (self.comments_min_spin, "comments_min")):
+            value = restored(key, spin.minimum())
+            spin.setValue(max(spin.minimum(), min(spin.maximum(), value)))
+        self.authors_edit.setText(restored("authors", ""))
+        self.session_dirty = False
+
+        self.logger.info(f"Загружен снимок сессии: {len(articles)} статей")
+
+    def save_session(self):
+        if not self.session_dirty:
+            return
 
-            # Получаем все данные ячеек
-            row_items = []
-            for col_idx in range(self.table.columnCount()):
-                item = self.table.item(row, col_idx)
-                row_items.append({
-                    'text': item.text() if item else '',
-                    'link': item.link if hasattr(item, 'link') else None,
-                    'tooltip': item.toolTip(),
-                    'alignment': item.textAlignment(),
-                    'user_data': item.data(Qt.UserRole) if col_idx == 7 else None
-                })
-
-            # Значение для сортировки
-            try:
-                sort_value = int(row_items[col]['text']) if row_items[col]['text'] else 0
-            except ValueError:
-                sort_value = 0
+        state = {
+            "sort_index": self.sort_combo.currentIndex(),
+            "tag_filter": self.tag_search.currentText(),
+            "filter_from": self.filter_from_edit.text(),
+            "filter_to": self.filter_to_edit.text(),
+            "rating_min": self.rating_min_spin.value(),
+            "rating_max": self.rating_max_spin.value(),
+            "comments_min": self.comments_min_spin.value(),
+            "authors": self.authors_edit.text(),
+        }
+        try:
+            save_snapshot(self.snapshot_path, self.articles_data, self.tag_index, state,
+                          self.metrics_history)
+            self.session_dirty = False
+        except (OSError, ValueError, OverflowError) as e:
+            # Сохранение вызывается из таймера и closeEvent, поэтому ошибка только логируется
+            self.logger.warning(f"Не удалось сохранить снимок сессии: {e}")
+
+    def show_analytics(self):
+        if not self.articles_data:
+            return
 
-            rows_data.append((sort_value, row_items))
+        if self.analytics_dialog is None:
+            self.analytics_dialog = AnalyticsDialog(self)
+            self.analytics_dialog.filter_requested.connect(self.apply_aggregate_filter)
+        self.analytics_dialog.status_label.setText("Расчёт...")
+        self.analytics_dialog.show()
+        self.analytics_dialog.raise_()
 
-        # Сортируем
-        rows_data.sort(key=lambda x: x[0], reverse=True)
+        if self.article_columns is None:
+            # Колонки ещё строятся, расчёт запустится из on_columns_ready
+            self.analytics_pending = True
+            return
+        self.start_analytics()
+
+    def start_analytics(self):
+        # Колонки не изменяются после построения, поэтому их можно отдать другому потоку
+        Thread(
+            target=self.analytics_worker.compute,
+            args=(self.article_columns,),
+            daemon=True
+        ).start()
+
+    def on_analytics_ready(self, tables):
+        if self.analytics_dialog is not None:
+            self.analytics_dialog.set_tables(tables)
+
+    def on_analytics_error(self, message):
+        # Ошибка аналитики не касается состояния парсинга, поэтому show_error здесь не подходит
+        if self.analytics_dialog is not None:
+            self.analytics_dialog.status_label.setText(message)
+        else:
+            QMessageBox.warning(self, "Ошибка", message)
 
-        # Очищаем таблицу
-        self.table.setRowCount(0)
-        self.table.setRowCount(len(rows_data))
+    def apply_aggregate_filter(self, kind, value):
+        if self.query_engine is None:
+            return
 
-        # Заполняем заново
-        for new_row, (_, row_items) in enumerate(rows_data):
-            for col_idx, item_data in enumerate(row_items):
-                if col_idx == 2 and item_data['link']:  # Столбец с ссылками
-                    item = ClickableTableWidgetItem(item_data['text'], item_data['link'])
-                else:
-                    item = QTableWidgetItem(item_data['text'])
+        self.clear_filter_widgets()
+
+        if kind in ("tag", "tags"):
+            self.tag_search.setEditText(value)
+        elif kind == "author":
+            self.authors_edit.setText(value)
+        elif kind == "day":
+            day = QDate.fromString(value, "yyyy-MM-dd").toString("dd.MM.yyyy")
+            self.filter_from_edit.setText(day)
+            self.filter_to_edit.setText(day)
+        elif kind == "week":
+            # Строка таблицы "Теги по неделям" - пара (начало недели, тег)
+            week, tag = value
+            week_start = QDate.fromString(week, "yyyy-MM-dd")
+            self.filter_from_edit.setText(week_start.toString("dd.MM.yyyy"))
+            self.filter_to_edit.setText(week_start.addDays(6).toString("dd.MM.yyyy"))
+            self.tag_search.setEditText(tag)
+        elif kind == "rating":
+            low, high = value
+            if low is not None:
+                self.rating_min_spin.setValue(low)
+            if high is not None:
+                self.rating_max_spin.setValue(high)
+
+        self.schedule_query()
+
+    def clear_filter_widgets(self):
+        widgets = [self.tag_search, self.filter_from_edit, self.filter_to_edit, self.rating_min_spin,
+                   self.rating_max_spin, self.comments_min_spin, self.authors_edit]
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.tag_search.setCurrentIndex(0)
+        self.tag_search.setEditText("")
+        self.filter_from_edit.clear()
+        self.filter_to_edit.clear()
+        self.rating_min_spin.setValue(FILTER_SPIN_MIN)
+        self.rating_max_spin.setValue(FILTER_SPIN_MIN)
+        self.comments_min_spin.setValue(0)
+        self.authors_edit.clear()
+        for widget in widgets:
+            widget.blockSignals(False)
 
-                # Восстанавливаем свойства
-                item.setToolTip(item_data['tooltip'])
-                item.setTextAlignment(item_data['alignment'])
+    def show_error(self, message):
+        # Ошибка отдельной страницы не останавливает поток, состояние сбросит его сигнал завершения
+        worker_running = self.parser_thread is not None and self.parser_thread.is_alive()
+        QMessageBox.warning(self, "Ошибка", message)
+        if worker_running:
+            return
+        self.is_parsing = False
+        self.parse_btn.setEnabled(True)
+        self.refresh_btn.setEnabled(bool(self.articles_data))
+        self.stop_btn.setEnabled(False)
+        self.progress.setValue(0)
+        if self.query_engine is None and self.articles_data:
+            # Парсинг не начался, возвращаем в таблицу прошлые статьи
+            self.set_articles(self.articles_data, self.tag_index)
+        else:
+            self.set_filters_enabled(True)
 
-                if col_idx == 7 and item_data['user_data']:  # Краткое содержание
-                    item.setData(Qt.UserRole, item_data['user_data'])
+    def cell_double_clicked(self, index):
+        article = self.table_model.article(index.row())
+        if index.column() == ArticlesTableModel.LINK_COLUMN:
+            webbrowser.open(article[2])
+        elif index.column() == ArticlesTableModel.DESCRIPTION_COLUMN:
+            full_text = article[7]
+            if full_text:
+                QMessageBox.information(self, "Краткое содержание статьи", full_text)
 
-                self.table.setItem(new_row, col_idx, item)
+    def reset_filters(self):
+        self.clear_filter_widgets()
+        self.sort_combo.blockSignals(True)
+        self.sort_combo.setCurrentIndex(0)
+        self.sort_combo.blockSignals(False)
+        self.schedule_query()
 
     def export_to_csv(self):
         if not self.articles_data:
@@ -516,8 +834,9 @@ class HabrParserApp(QMainWindow):
                 writer = csv.writer(f, delimiter=';')
                 writer.writerow(
                     ["Дата", "Заголовок", "Ссылка", "Автор", "Рейтинг", "Комментарии", "Теги", "Краткое содержание"])
-                for row in range(self.table.rowCount()):
-                    row_data = [self.table.item(row, c).text() for c in range(8)]
+                for row in range(self.table_model.rowCount()):
+                    article = self.table_model.article(row)
+                    row_data = [self.table_model.display_text(article, c) for c in range(8)]
                     writer.writerow(row_data)
 
             QMessageBox.information(self, "Успех", f"Данные сохранены в:\n{path}")
@@ -526,6 +845,12 @@ class HabrParserApp(QMainWindow):
 
     def closeEvent(self, event):
         self.stop_parsing()
+        if self.parser_thread and self.parser_thread.is_alive():
+            self.parser_thread.join(timeout=1)
+        # Доставляем частичные результаты до сохранения снимка
+        QApplication.processEvents()
+        self.autosave_timer.stop()
+        self.save_session()
         event.accept()
 
 
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+import numpy as np
+
+# Индексы соответствуют пунктам выпадающего списка сортировки
+SORT_NONE, SORT_DATE_ASC, SORT_DATE_DESC, SORT_RATING, SORT_COMMENTS = range(5)
+MASK_CACHE_SIZE = 64
+
+
+class ArticleQuery:
+    """Набор условий фильтра. Незаданные условия (None/пустые) не ограничивают выборку"""
+
+    def __init__(self, date_from=None, date_to=None, rating_min=None, rating_max=None,
+                 comments_min=None, authors=(), tags=()):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.rating_min = rating_min
+        self.rating_max = rating_max
+        self.comments_min = comments_min
+        self.authors = frozenset(a.strip().lower() for a in authors if a.strip())
+        self.tags = frozenset(t.strip().lower() for t in tags if t.strip())
+
+    def predicates(self):
+        """Условия в виде хешируемых пар (имя, значение) - по ним же кешируются маски"""
+        result = []
+        for name in ("date_from", "date_to", "rating_min", "rating_max", "comments_min"):
+            value = getattr(self, name)
+            if value is not None:
+                result.append((name, value))
+        if self.authors:
+            result.append(("authors", self.authors))
+        # Каждый тег - отдельное условие, чтобы маски тегов переиспользовались в разных сочетаниях
+        result.extend(("tag", tag) for tag in sorted(self.tags))
+        return tuple(result)
+
+
+class QueryEngine:
+    """Компилирует условия в булевы маски над колонками ArticleColumns"""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.tag_lookup = {name: code for code, name in enumerate(columns.tag_names)}
+        self.author_lookup = {}
+        for code, name in enumerate(columns.author_names):
+            self.author_lookup.setdefault(name.lower(), []).append(code)
+        self._cache = OrderedDict()
+
+    def rows(self, query, sort_index=SORT_NONE):
+        """Номера видимых статей в порядке отображения"""
+        rows = np.flatnonzero(self.mask(query))
+
+        if sort_index == SORT_DATE_ASC:
+            key = self.columns.days[rows]
+        elif sort_index == SORT_DATE_DESC:
+            key = -self.columns.days[rows]
+        elif sort_index == SORT_RATING:
+            key = -self.columns.ratings[rows]
+        elif sort_index == SORT_COMMENTS:
+            key = -self.columns.comments[rows]
+        else:
+            return rows
+        return rows[np.argsort(key, kind="stable")]
+
+    def mask(self, query):
+        predicates = query.predicates()
+        if not predicates:
+            return np.ones(self.columns.size, dtype=bool)
+
+        return self._cached(("and", predicates), lambda: np.logical_and.reduce(
+            [self._cached(predicate, lambda p=predicate: self._compile(*p)) for predicate in predicates]))
+
+    def _cached(self, key, build):
+        mask = self._cache.get(key)
+        if mask is not None:
+            self._cache.move_to_end(key)
+            return mask
+
+        mask = build()
+        self._cache[key] = mask
+        if len(self._cache) > MASK_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return mask
+
+    def _compile(self, name, value):
+        columns = self.columns
+        if name == "date_from":
+            return columns.days >= _day_number(value)
+        if name == "date_to":
+            return columns.days <= _day_number(value)
+        if name == "rating_min":
+            return columns.ratings >= value
+        if name == "rating_max":
+            return columns.ratings <= value
+        if name == "comments_min":
+            return columns.comments >= value
+        if name == "authors":
+            codes = [code for author in value for code in self.author_lookup.get(author, ())]
+            return np.isin(columns.author_codes, codes)
+        if name == "tag":
+            mask = np.zeros(columns.size, dtype=bool)
+            code = self.tag_lookup.get(value)
+            if code is not None:
+                mask[columns.tag_article[columns.tag_codes == code]] = True
+            return mask
+        raise ValueError(f"Неизвестное условие фильтра: {name}")
+
+
+def _day_number(iso_date):
+    return np.datetime64(iso_date, 'D').astype(np.int64)
@@ -0,0 +1,252 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import time
+from array import array
+
+# Формат снимка сессии:
+#   заголовок  <8sHHI  (magic, версия, резерв, число секций)
+#   каталог    <8sQQ   (имя секции, смещение, длина) на каждую секцию
+#   секции     выровнены по 8 байт
+#
+# Секции:
+#   meta     - JSON: число строк/колонок, порядок байт, состояние сортировки/фильтра
+#   strdata  - таблица строк в UTF-8, разделённых NUL
+#   columns  - uint32 индексы в таблицу строк, колонка за колонкой
+#   tagnames - uint32 индексы имён тегов в таблице строк
+#   tagoffs  - uint32 границы списков строк для каждого тега (CSR)
+#   tagrows  - uint32 номера строк, относящихся к тегу
+#   histrows - uint32 номер строки для каждой точки истории метрик
+#   histtime - float64 время снятия метрик (unix time)
+#   histrate - int32 рейтинг
+#   histcomm - int32 число комментариев
+#
+# Секции истории необязательны: снимки без них читаются с пустой историей.
+
+SNAPSHOT_MAGIC = b"HABRSNP1"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_COLUMNS = 8
+
+_HEADER = struct.Struct("<8sHHI")
+_SECTION = struct.Struct("<8sQQ")
+_ALIGN = 8
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def default_snapshot_path():
+    return os.path.join(os.path.expanduser("~"), ".habr_crawler", "session.snap")
+
+
+def build_tag_index(articles):
+    """Строит индекс тег -> номера статей по колонке тегов"""
+    tag_index = {}
+    for row, article in enumerate(articles):
+        for tag in article[6].split(','):
+            tag = tag.strip().lower()
+            if tag:
+                rows = tag_index.setdefault(tag, [])
+                if not rows or rows[-1] != row:
+                    rows.append(row)
+    return tag_index
+
+
+def save_snapshot(path, articles, tag_index, state=None, metrics_history=None):
+    strings = []
+    string_ids = {}
+
+    def intern(value):
+        value = str(value).replace('\0', '')
+        idx = string_ids.get(value)
+        if idx is None:
+            idx = len(strings)
+            string_ids[value] = idx
+            strings.append(value)
+        return idx
+
+    columns = array('I')
+    for col in range(SNAPSHOT_COLUMNS):
+        columns.extend(intern(article[col]) for article in articles)
+
+    tag_names = array('I')
+    tag_offsets = array('I', [0])
+    tag_rows = array('I')
+    for tag in sorted(tag_index):
+        tag_names.append(intern(tag))
+        tag_rows.extend(tag_index[tag])
+        tag_offsets.append(len(tag_rows))
+
+    hist_rows = array('I')
+    hist_time = array('d')
+    hist_rating = array('i')
+    hist_comments = array('i')
+    if metrics_history:
+        for row, article in enumerate(articles):
+            for timestamp, rating, comments in metrics_history.get(article[2], ()):
+                hist_rows.append(row)
+                hist_time.append(timestamp)
+                # Значения со страницы не ограничены сверху, а секции хранят int32
+                hist_rating.append(_clamp_int32(rating))
+                hist_comments.append(_clamp_int32(comments))
+
+    meta = {
+        "rows": len(articles),
+        "columns": SNAPSHOT_COLUMNS,
+        "strings": len(strings),
+        "byteorder": sys.byteorder,
+        "saved_at": time.time(),
+        "state": state or {},
+    }
+
+    sections = [
+        (b"meta", json.dumps(meta, ensure_ascii=False).encode("utf-8")),
+        (b"strdata", '\0'.join(strings).encode("utf-8")),
+        (b"columns", columns.tobytes()),
+        (b"tagnames", tag_names.tobytes()),
+        (b"tagoffs", tag_offsets.tobytes()),
+        (b"tagrows", tag_rows.tobytes()),
+        (b"histrows", hist_rows.tobytes()),
+        (b"histtime", hist_time.tobytes()),
+        (b"histrate", hist_rating.tobytes()),
+        (b"histcomm", hist_comments.tobytes()),
+    ]
+
+    directory = []
+    offset = _align(_HEADER.size + _SECTION.size * len(sections))
+    for name, payload in sections:
+        directory.append((name, offset, len(payload)))
+        offset = _align(offset + len(payload))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(sections)))
+        for name, section_offset, length in directory:
+            f.write(_SECTION.pack(name, section_offset, length))
+        for (name, section_offset, length), (_, payload) in zip(directory, sections):
+            f.write(b"\0" * (section_offset - f.tell()))
+            f.write(payload)
+    # Атомарная замена, чтобы прерванная запись не испортила прошлый снимок
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """Читает снимок через mmap, возвращает (articles, tag_index, state, metrics_history).
+    Любое повреждение файла сообщается как SnapshotError"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            raise SnapshotError("Файл снимка повреждён")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                return _read_snapshot(mm)
+            except SnapshotError:
+                raise
+            except (struct.error, ValueError, TypeError, KeyError, IndexError, AttributeError) as e:
+                # Явные проверки ниже покрывают известные повреждения, это - страховка от остальных
+                raise SnapshotError(f"Файл снимка повреждён: {e}")
+
+
+def _read_snapshot(mm):
+    magic, version, _, section_count = _HEADER.unpack_from(mm, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Неизвестный формат снимка")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Неподдерживаемая версия снимка: {version}")
+    if _HEADER.size + section_count * _SECTION.size > len(mm):
+        raise SnapshotError("Каталог секций снимка повреждён")
+
+    directory = {}
+    for i in range(section_count):
+        name, offset, length = _SECTION.unpack_from(mm, _HEADER.size + i * _SECTION.size)
+        if offset + length > len(mm):
+            raise SnapshotError("Файл снимка повреждён")
+        directory[name.rstrip(b"\0")] = (offset, length)
+
+    def section(name):
+        try:
+            offset, length = directory[name]
+        except KeyError:
+            raise SnapshotError(f"В снимке нет секции {name.decode()}")
+        return mm[offset:offset + length]
+
+    meta = json.loads(section(b"meta").decode("utf-8"))
+    if not isinstance(meta, dict) or not all(isinstance(meta.get(key), int)
+                                             for key in ("rows", "columns", "strings")):
+        raise SnapshotError("Метаданные снимка повреждены")
+    if meta["columns"] != SNAPSHOT_COLUMNS:
+        raise SnapshotError("Колонки снимка повреждены")
+    swap = meta.get("byteorder", sys.byteorder) != sys.byteorder
+
+    def typed_array(name, typecode='I'):
+        if name not in directory:
+            raise SnapshotError(f"В снимке нет секции {name.decode()}")
+        offset, length = directory[name]
+        if length % array(typecode).itemsize:
+            raise SnapshotError(f"Секция {name.decode()} снимка повреждена")
+        with memoryview(mm) as view, view[offset:offset + length] as chunk:
+            if not swap:
+                with chunk.cast(typecode) as values:
+                    return values.tolist()
+            values = array(typecode, chunk.tobytes())
+            values.byteswap()
+            return values.tolist()
+
+    def check_indices(values, limit, what):
+        if values and max(values) >= limit:
+            raise SnapshotError(f"{what} снимка повреждены")
+
+    strings = section(b"strdata").decode("utf-8").split('\0')
+    if len(strings) != meta["strings"] and meta["strings"] > 0:
+        raise SnapshotError("Таблица строк снимка повреждена")
+
+    rows = meta["rows"]
+    columns = typed_array(b"columns")
+    if len(columns) != rows * meta["columns"]:
+        raise SnapshotError("Колонки снимка повреждены")
+    check_indices(columns, len(strings), "Колонки")
+    decoded = [[strings[i] for i in columns[col * rows:(col + 1) * rows]]
+               for col in range(meta["columns"])]
+    articles = [list(row) for row in zip(*decoded)]
+
+    tag_names = typed_array(b"tagnames")
+    tag_offsets = typed_array(b"tagoffs")
+    tag_rows = typed_array(b"tagrows")
+    check_indices(tag_names, len(strings), "Имена тегов")
+    check_indices(tag_rows, rows, "Строки тегов")
+    if (len(tag_offsets) != len(tag_names) + 1 or tag_offsets[0] != 0 or
+            tag_offsets[-1] != len(tag_rows) or
+            any(a > b for a, b in zip(tag_offsets, tag_offsets[1:]))):
+        raise SnapshotError("Индекс тегов снимка повреждён")
+    tag_index = {
+        strings[name]: tag_rows[tag_offsets[i]:tag_offsets[i + 1]]
+        for i, name in enumerate(tag_names)
+    }
+
+    metrics_history = {}
+    if b"histrows" in directory:
+        hist_rows = typed_array(b"histrows")
+        hist_time = typed_array(b"histtime", 'd')
+        hist_rating = typed_array(b"histrate", 'i')
+        hist_comments = typed_array(b"histcomm", 'i')
+        if not len(hist_rows) == len(hist_time) == len(hist_rating) == len(hist_comments):
+            raise SnapshotError("История метрик снимка повреждена")
+        check_indices(hist_rows, rows, "Строки истории метрик")
+        for row, timestamp, rating, comments in zip(hist_rows, hist_time, hist_rating, hist_comments):
+            link = articles[row][2]
+            metrics_history.setdefault(link, []).append((timestamp, rating, comments))
+
+    state = meta.get("state")
+    return articles, tag_index, state if isinstance(state, dict) else {}, metrics_history
+
+
+def _clamp_int32(value):
+    return max(_INT32_MIN, min(_INT32_MAX, int(value)))
+
+
+def _align(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
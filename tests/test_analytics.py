@@ -0,0 +1,118 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PyQt5")
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+from analytics import (ArticleColumns, average_ranks, compute_analytics, group_stats,
+                       tag_cooccurrence, tag_index_from_columns)
+from session_store import build_tag_index
+
+ARTICLES = [
+    ["2024-01-01", "Первая", "https://habr.com/1", "alice", "+5", "3", "Python, ИИ, python", "Описание"],
+    ["2024-01-02", "Вторая", "https://habr.com/2", "bob", "-1", "0", "", "Нет описания"],
+    ["2024-01-02", "Третья", "https://habr.com/3", "alice", "12", "7", "python,, Linux", "Описание"],
+    ["2024-01-09", "Четвёртая", "https://habr.com/4", "carol", "\u22123", "15", "ии, linux", "Описание"],
+]
+
+
+def test_group_stats_matches_numpy():
+    rng = np.random.default_rng(7)
+    n_groups = 6
+    codes = rng.integers(0, n_groups - 1, size=1000)  # последняя группа остаётся пустой
+    values = rng.integers(-50, 500, size=1000)
+
+    stats = group_stats(codes, n_groups, values)
+
+    for group in range(n_groups):
+        group_values = values[codes == group]
+        assert stats["count"][group] == group_values.size
+        assert stats["sum"][group] == group_values.sum()
+        if group_values.size:
+            assert stats[0.5][group] == pytest.approx(np.median(group_values))
+            assert stats[0.9][group] == pytest.approx(np.percentile(group_values, 90))
+        else:
+            assert stats[0.5][group] == 0 and stats[0.9][group] == 0
+
+
+def test_group_stats_single_value_and_empty_input():
+    stats = group_stats(np.array([1]), 3, np.array([42]))
+    assert stats["count"].tolist() == [0, 1, 0]
+    assert stats[0.5].tolist() == [0, 42, 0]
+    assert stats[0.9].tolist() == [0, 42, 0]
+
+    stats = group_stats(np.array([], dtype=np.int64), 2, np.array([], dtype=np.int64))
+    assert stats["count"].tolist() == [0, 0]
+    assert stats[0.5].tolist() == [0, 0]
+
+
+def test_columns_encode_values_and_tags():
+    columns = ArticleColumns(ARTICLES)
+
+    assert columns.ratings.tolist() == [5, -1, 12, -3]
+    assert columns.comments.tolist() == [3, 0, 7, 15]
+    assert columns.author_names[columns.author_codes].tolist() == ["alice", "bob", "alice", "carol"]
+
+    # Теги приводятся к нижнему регистру, пустые и повторные внутри статьи отбрасываются
+    article_tags = [sorted(columns.tag_names[columns.tag_codes[columns.tag_indptr[i]:columns.tag_indptr[i + 1]]])
+                    for i in range(len(ARTICLES))]
+    assert article_tags == [["python", "ии"], [], ["linux", "python"], ["linux", "ии"]]
+
+
+def test_tag_index_from_columns_matches_build_tag_index():
+    columns = ArticleColumns(ARTICLES)
+
+    assert tag_index_from_columns(columns) == build_tag_index(ARTICLES)
+    assert tag_index_from_columns(ArticleColumns([])) == {}
+
+
+def test_tag_cooccurrence():
+    columns = ArticleColumns(ARTICLES)
+    names = columns.tag_names
+
+    rows, cols, counts = tag_cooccurrence(columns)
+    pairs = {tuple(sorted((names[a], names[b]))): n for a, b, n in zip(rows, cols, counts)}
+
+    assert pairs == {("python", "ии"): 1, ("linux", "python"): 1, ("linux", "ии"): 1}
+
+
+def test_compute_analytics_on_empty_columns():
+    for title, headers, rows, _ in compute_analytics(ArticleColumns([])):
+        assert rows == []
+
+
+def _articles(ratings, comments, tags=""):
+    return [["2024-01-01", "Статья", f"https://habr.com/{i}", "alice", str(r), str(c), tags, ""]
+            for i, (r, c) in enumerate(zip(ratings, comments))]
+
+
+def test_average_ranks_share_ranks_between_ties():
+    values = np.array([3, 1, 3, 2, 3, 1])
+
+    expected = [np.flatnonzero(np.sort(values) == v).mean() for v in values]
+
+    assert average_ranks(values).tolist() == pytest.approx(expected)
+
+
+def test_spearman_with_ties():
+    ratings = [0] * 99 + [1]
+    tables = compute_analytics(ArticleColumns(_articles(ratings, range(100))))
+
+    # Средние ранги: 0.17, а не 1.00, как при порядковых рангах
+    assert "Спирмен 0.17" in tables[-1][0]
+
+
+def test_week_rows_filter_by_week_and_tag():
+    articles = _articles([1, 2, 3], [0, 0, 0])
+    articles[0][6] = "python"
+    articles[1][6] = "python, go"
+    articles[2][0], articles[2][6] = "2024-01-10", "go"
+
+    title, headers, rows, filters = next(t for t in compute_analytics(ArticleColumns(articles))
+                                         if t[0] == "Теги по неделям")
+
+    assert [(row[0], row[1]) for row in rows] == [value for kind, value in filters]
+    assert sorted(value for kind, value in filters) == [
+        ("2024-01-01", "go"), ("2024-01-01", "python"), ("2024-01-08", "go")]
+    assert {kind for kind, value in filters} == {"week"}
@@ -0,0 +1,256 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PyQt5")
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+from habr_parser import HabrParser, ParsingCancelled, parse_count
+
+
+def _item(date, slug, rating="5", comments="1"):
+    return (f'<article class="tm-articles-list__item">'
+            f'<time datetime="{date}T10:00:00.000Z"></time>'
+            f'<h2><a href="/ru/articles/{slug}/">Статья {slug}</a></h2>'
+            f'<a class="tm-user-info__username">alice</a>'
+            f'<span class="tm-votes-meter__value">{rating}</span>'
+            f'<span class="tm-article-comments-counter-link__value">{comments}</span>'
+            f'</article>')
+
+
+# Заголовок без ссылки - элемент ленты, на котором parse_listing_item падает
+BROKEN_ITEM = ('<article class="tm-articles-list__item"><time datetime="2024-01-10T10:00:00.000Z"></time>'
+               '<h2>Без ссылки</h2></article>')
+
+
+def _link(slug):
+    return f"https://habr.com/ru/articles/{slug}/"
+
+
+@pytest.fixture
+def parser():
+    parser = HabrParser()
+    # Паузы между страницами в тестах не нужны, но остановку они по-прежнему сообщают
+    parser.wait = lambda seconds: parser.stop_parsing
+    return parser
+
+
+def _serve(parser, pages):
+    """Подменяет загрузку страниц ленты, возвращает список запрошенных url"""
+    requested = []
+
+    def fetch_text(url, timeout=15):
+        requested.append(url)
+        page = int(url.rstrip('/').rsplit("page", 1)[1])
+        if page not in pages:
+            return "404 Not Found"
+        return "<html>" + "".join(pages[page]) + "</html>"
+
+    parser.fetch_text = fetch_text
+    return requested
+
+
+def _refresh(parser, known_links, since_date, **kwargs):
+    finished = []
+    parser.refresh_finished.connect(lambda metrics, not_found: finished.append((metrics, not_found)))
+    parser.refresh_metrics(known_links, since_date, **kwargs)
+    assert len(finished) == 1
+    return finished[0]
+
+
+def test_parse_count():
+    assert parse_count("12") == 12
+    assert parse_count(" +7 ") == 7
+    assert parse_count("−13") == -13
+    assert parse_count("1 024") == 1024
+    assert parse_count("abc") == 0
+
+
+def test_refresh_matches_known_links_and_stops_at_since_date(parser):
+    requested = _serve(parser, {
+        1: [_item("2024-01-12", 1, "+10", "4"), BROKEN_ITEM, _item("2024-01-11", 2, "3", "0")],
+        2: [_item("2024-01-10", 3, "−2", "8"), _item("2024-01-08", 4)],
+        3: [_item("2024-01-07", 5)],
+    })
+
+    metrics, not_found = _refresh(parser, [_link(1), _link(3), _link(99)], "2024-01-09")
+
+    assert metrics == {_link(1): ("+10", "4"), _link(3): ("−2", "8")}
+    assert not_found == 1
+    # На второй странице лента ушла раньше since_date, третья не запрашивается
+    assert len(requested) == 2
+
+
+def test_refresh_stops_when_all_links_found(parser):
+    requested = _serve(parser, {1: [_item("2024-01-12", 1)], 2: [_item("2024-01-11", 2)]})
+
+    metrics, not_found = _refresh(parser, [_link(1)], "2024-01-01")
+
+    assert metrics == {_link(1): ("5", "1")}
+    assert not_found == 0
+    assert len(requested) == 1
+
+
+def test_refresh_respects_max_pages(parser):
+    requested = _serve(parser, {page: [_item("2024-01-12", page)] for page in range(1, 10)})
+
+    metrics, not_found = _refresh(parser, [_link(2), _link(8)], "2024-01-01", max_pages=3)
+
+    assert metrics == {_link(2): ("5", "1")}
+    assert not_found == 1
+    assert len(requested) == 3
+
+
+def test_refresh_cancelled_keeps_found_metrics(parser):
+    pages = {1: [_item("2024-01-12", 1)], 2: [_item("2024-01-11", 2)]}
+    requested = _serve(parser, pages)
+    fetch_page = parser.fetch_text
+
+    def fetch_text(url, timeout=15):
+        if requested:
+            raise ParsingCancelled()
+        return fetch_page(url, timeout)
+
+    parser.fetch_text = fetch_text
+
+    metrics, not_found = _refresh(parser, [_link(1), _link(2)], "2024-01-01")
+
+    assert metrics == {_link(1): ("5", "1")}
+    assert not_found == 1
+
+
+class FakeResponse:
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.encoding = "utf-8"
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    """Сессия, которая отвечает заготовленными страницами, а на url из blocking
+    не отвечает, пока тест не отпустит release"""
+
+    def __init__(self, pages=None, blocking=(), delay=0.0):
+        self.pages = pages or {}
+        self.blocking = set(blocking)
+        self.delay = delay
+        self.release = threading.Event()
+        self.closed = False
+
+    def get(self, url, timeout=None, stream=False):
+        if url in self.blocking:
+            self.release.wait(10)
+        return FakeResponse(self.pages.get(url, [b"<html></html>"]), self.delay)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_session(parser):
+    sessions = []
+
+    def install(*args, **kwargs):
+        session = FakeSession(*args, **kwargs)
+        parser.session = session
+        sessions.append(session)
+        return session
+
+    yield install
+    # Отпускаем брошенные daemon-потоки запросов
+    for session in sessions:
+        session.release.set()
+
+
+def _stop_after(parser, seconds):
+    timer = threading.Timer(seconds, parser.stop)
+    timer.start()
+    return timer
+
+
+def test_fetch_text_reads_streamed_body(parser, fake_session):
+    fake_session({"https://habr.com/a": ["Привет, ".encode(), "мир".encode()]})
+
+    assert parser.fetch_text("https://habr.com/a") == "Привет, мир"
+
+
+def test_fetch_text_cancelled_while_waiting_for_response(parser, fake_session):
+    session = fake_session(blocking={"https://habr.com/slow"})
+    _stop_after(parser, 0.1)
+
+    started = time.monotonic()
+    with pytest.raises(ParsingCancelled):
+        parser.fetch_text("https://habr.com/slow")
+
+    assert time.monotonic() - started < 0.5
+    # Брошенный запрос остался на старой сессии, следующий пойдёт через новую
+    assert session.closed and parser.session is not session
+
+
+def test_fetch_text_cancelled_while_streaming(parser, fake_session):
+    fake_session({"https://habr.com/big": [b"x" * 1024] * 200}, delay=0.02)
+    _stop_after(parser, 0.1)
+
+    started = time.monotonic()
+    with pytest.raises(ParsingCancelled):
+        parser.fetch_text("https://habr.com/big")
+
+    assert time.monotonic() - started < 0.5
+
+
+def test_fetch_text_after_stop_raises_immediately(parser, fake_session):
+    fake_session()
+    parser.stop()
+
+    with pytest.raises(ParsingCancelled):
+        parser.fetch_text("https://habr.com/a")
+
+
+def test_wait_returns_early_on_stop():
+    parser = HabrParser()
+    _stop_after(parser, 0.05)
+
+    started = time.monotonic()
+    assert parser.wait(5) is True
+    assert time.monotonic() - started < 0.5
+
+    parser.stop_parsing = False
+    assert parser.wait(0.01) is False
+
+
+def test_parse_habr_emits_collected_articles_when_cancelled_mid_page(parser, fake_session):
+    listing = [_item("2024-01-12", 1), _item("2024-01-12", 2), _item("2024-01-12", 3)]
+    article_page = (b'<div class="tm-article-body"><p>Text</p></div>'
+                    b'<div class="tm-article-presenter__meta-list">'
+                    b'<a class="tm-tags-list__link">Python</a></div>')
+    fake_session({
+        "https://habr.com/ru/all/page1/": ["".join(listing).encode()],
+        _link(1): [article_page],
+    }, blocking={_link(2)})
+    finished = []
+    parser.parsing_finished.connect(lambda articles, tags: finished.append((articles, tags)))
+    _stop_after(parser, 0.2)
+
+    started = time.monotonic()
+    parser.parse_habr("2024-01-01", "2024-01-31")
+
+    assert time.monotonic() - started < 1
+    assert len(finished) == 1
+    articles, tags = finished[0]
+    assert [article[2] for article in articles] == [_link(1)]
+    assert articles[0][6:] == ["Python", "Text"]
+    assert tags == ["Python"]
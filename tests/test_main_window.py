@@ -0,0 +1,124 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PyQt5")
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+import main_window
+
+ARTICLES = [
+    ["2024-01-01", "Первая", "https://habr.com/1", "alice", "5", "3", "python, ии", "Описание"],
+    ["2024-01-02", "Вторая", "https://habr.com/2", "bob", "-1", "0", "", "Описание"],
+    ["2024-01-08", "Третья", "https://habr.com/3", "alice", "12", "7", "python", "Описание"],
+]
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def window(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(main_window, "default_snapshot_path", lambda: str(tmp_path / "session.snap"))
+    messages = []
+    monkeypatch.setattr(main_window.QMessageBox, "information",
+                        lambda parent, title, text: messages.append(text))
+    window = main_window.HabrParserApp()
+    window.messages = messages
+    yield window
+    window.autosave_timer.stop()
+    window.close()
+
+
+def _process_until(app, condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def _load(app, window, articles):
+    window.set_articles([list(article) for article in articles])
+    _process_until(app, lambda: window.query_engine is not None)
+
+
+def test_refresh_updates_articles_in_place(app, window):
+    _load(app, window, ARTICLES)
+    window.metrics_history = {"https://habr.com/1": [(1.0, 4, 3)]}
+    window.is_parsing = True
+
+    window.on_refresh_finished({"https://habr.com/1": ("+8", "3"), "https://habr.com/3": ("12", "7")}, 1)
+
+    assert not window.is_parsing
+    assert window.articles_data[0][4:6] == ["+8", "3"]
+    assert window.articles_data[2][4:6] == ["12", "7"]
+    # Подсвечиваются только статьи, у которых метрики изменились
+    assert window.table_model.highlighted_links == {"https://habr.com/1"}
+    assert [point[1:] for point in window.metrics_history["https://habr.com/1"]] == [(4, 3), (8, 3)]
+    assert [point[1:] for point in window.metrics_history["https://habr.com/3"]] == [(12, 7)]
+    assert "https://habr.com/2" not in window.metrics_history
+    assert len(window.messages) == 1 and "Не найдено в ленте: 1" in window.messages[0]
+
+    # Колонки пересобираются с новыми значениями
+    _process_until(app, lambda: window.article_columns.ratings.tolist() == [8, -1, 12])
+
+
+def test_refresh_without_changes_keeps_columns(app, window):
+    _load(app, window, ARTICLES)
+    engine = window.query_engine
+
+    window.on_refresh_finished({"https://habr.com/2": ("-1", "0")}, 0)
+
+    assert window.table_model.highlighted_links == set()
+    assert window.query_engine is engine
+    assert window.messages == []
+
+
+def test_week_filter_selects_week_and_tag(app, window):
+    _load(app, window, ARTICLES)
+
+    window.apply_aggregate_filter("week", ("2024-01-01", "python"))
+    window.apply_query()
+
+    assert window.filter_from_edit.text() == "01.01.2024"
+    assert window.filter_to_edit.text() == "07.01.2024"
+    assert window.tag_search.currentText() == "python"
+    assert [window.table_model.article(row)[2] for row in range(window.table_model.rowCount())] == [
+        "https://habr.com/1"]
+
+
+def test_crawl_detaches_previous_articles(app, window, monkeypatch):
+    _load(app, window, ARTICLES)
+    monkeypatch.setattr(window.parser, "parse_habr", lambda *args: None)
+    # Сборка колонок, начатая до парсинга, не должна вернуть прошлые данные
+    window.update_columns()
+
+    window.start_parsing()
+    window.apply_aggregate_filter("tag", "python")
+    window.apply_query()
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        app.processEvents()
+
+    assert window.table_model.rowCount() == 0
+    assert window.query_engine is None
+    assert not window.export_btn.isEnabled()
+    assert not window.analytics_btn.isEnabled()
+    assert not any(widget.isEnabled() for widget in window.filter_widgets)
+
+    window.on_parsing_finished([list(ARTICLES[2])], [])
+    _process_until(app, lambda: window.query_engine is not None)
+
+    assert window.table_model.rowCount() == 1
+    assert window.export_btn.isEnabled() and window.analytics_btn.isEnabled()
+    assert all(widget.isEnabled() for widget in window.filter_widgets)
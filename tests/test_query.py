@@ -0,0 +1,108 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PyQt5")
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+
+from analytics import ArticleColumns
+from habr_parser import parse_count
+from query import (ArticleQuery, QueryEngine, SORT_COMMENTS, SORT_DATE_ASC, SORT_DATE_DESC,
+                   SORT_NONE, SORT_RATING)
+
+AUTHORS = ["alice", "Bob", "carol", "dave"]
+TAGS = ["Python", "ИИ", "linux", "go", "C++"]
+
+
+def _articles(count=500, seed=1):
+    rnd = random.Random(seed)
+    start = date(2024, 1, 1)
+    articles = []
+    for i in range(count):
+        tags = ", ".join(rnd.sample(TAGS, rnd.randint(0, 3)))
+        rating = rnd.randint(-20, 150)
+        articles.append([
+            (start + timedelta(days=rnd.randint(0, 60))).isoformat(),
+            f"Статья {i}",
+            f"https://habr.com/{i}",
+            rnd.choice(AUTHORS),
+            f"+{rating}" if rating > 0 else str(rating),
+            str(rnd.randint(0, 40)),
+            tags,
+            "Описание",
+        ])
+    return articles
+
+
+def _matches(article, query):
+    tags = {t.strip().lower() for t in article[6].split(',') if t.strip()}
+    return ((query.date_from is None or article[0] >= query.date_from) and
+            (query.date_to is None or article[0] <= query.date_to) and
+            (query.rating_min is None or parse_count(article[4]) >= query.rating_min) and
+            (query.rating_max is None or parse_count(article[4]) <= query.rating_max) and
+            (query.comments_min is None or parse_count(article[5]) >= query.comments_min) and
+            (not query.authors or article[3].lower() in query.authors) and
+            query.tags <= tags)
+
+
+QUERIES = [
+    ArticleQuery(),
+    ArticleQuery(date_from="2024-01-15", date_to="2024-02-10"),
+    ArticleQuery(rating_min=0, rating_max=50),
+    ArticleQuery(comments_min=20, authors=["BOB", " alice "]),
+    ArticleQuery(tags=["python"]),
+    ArticleQuery(tags=["Python", "ии"], rating_min=10),
+    ArticleQuery(tags=["нет такого"]),
+    ArticleQuery(authors=["никто"]),
+    ArticleQuery(date_from="2024-02-01", rating_min=-5, comments_min=5, authors=["carol"], tags=["linux"]),
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_rows_match_brute_force(query):
+    articles = _articles()
+    engine = QueryEngine(ArticleColumns(articles))
+
+    expected = [i for i, article in enumerate(articles) if _matches(article, query)]
+
+    assert engine.rows(query).tolist() == expected
+
+
+@pytest.mark.parametrize("sort_index, key", [
+    (SORT_DATE_ASC, lambda a: a[0]),
+    (SORT_DATE_DESC, lambda a: -date.fromisoformat(a[0]).toordinal()),
+    (SORT_RATING, lambda a: -parse_count(a[4])),
+    (SORT_COMMENTS, lambda a: -parse_count(a[5])),
+])
+def test_rows_sorted_stably(sort_index, key):
+    articles = _articles()
+    engine = QueryEngine(ArticleColumns(articles))
+    query = ArticleQuery(rating_min=0)
+
+    rows = [i for i, article in enumerate(articles) if _matches(article, query)]
+    expected = sorted(rows, key=lambda i: key(articles[i]))
+
+    assert engine.rows(query, sort_index).tolist() == expected
+
+
+def test_masks_are_reused_between_queries():
+    engine = QueryEngine(ArticleColumns(_articles()))
+
+    first = engine.mask(ArticleQuery(rating_min=10, tags=["python"]))
+    again = engine.mask(ArticleQuery(rating_min=10, tags=["Python "]))
+    engine.mask(ArticleQuery(rating_min=10, tags=["linux"]))
+
+    assert again is first
+    assert ("rating_min", 10) in engine._cache
+    assert ("tag", "python") in engine._cache
+
+
+def test_empty_articles():
+    engine = QueryEngine(ArticleColumns([]))
+
+    assert engine.rows(ArticleQuery()).tolist() == []
+    assert engine.rows(ArticleQuery(tags=["python"]), SORT_RATING).tolist() == []
+    assert engine.rows(ArticleQuery(), SORT_NONE).tolist() == []
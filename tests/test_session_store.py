@@ -0,0 +1,112 @@
+import struct
+from array import array
+
+import pytest
+
+from session_store import build_tag_index, load_snapshot, save_snapshot, SnapshotError
+
+ARTICLES = [
+    ["2024-01-01", "Первая", "https://habr.com/1", "alice", "+5", "3", "Python, ИИ", "Описание"],
+    ["2024-01-02", "Вторая", "https://habr.com/2", "bob", "-1", "0", "", "Нет описания"],
+    ["2024-01-02", "Третья", "https://habr.com/3", "alice", "12", "7", "python", "Описание"],
+]
+HISTORY = {
+    "https://habr.com/1": [(1.5, 3, 1), (2.5, 5, 3)],
+    "https://habr.com/3": [(1.5, 12, 7)],
+}
+
+
+def _save(path):
+    save_snapshot(str(path), ARTICLES, build_tag_index(ARTICLES), {"sort_index": 3}, HISTORY)
+    return path.read_bytes()
+
+
+def _section(data, wanted):
+    _, _, _, count = struct.unpack_from("<8sHHI", data, 0)
+    for i in range(count):
+        name, offset, length = struct.unpack_from("<8sQQ", data, 16 + i * 24)
+        if name.rstrip(b"\0") == wanted:
+            return offset, length
+    raise LookupError(wanted)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "session.snap"
+    _save(path)
+
+    articles, tag_index, state, history = load_snapshot(str(path))
+
+    assert articles == ARTICLES
+    assert tag_index == {"python": [0, 2], "ии": [0]}
+    assert state == {"sort_index": 3}
+    assert history == HISTORY
+
+
+def test_round_trip_empty(tmp_path):
+    path = tmp_path / "session.snap"
+    save_snapshot(str(path), [], {})
+
+    assert load_snapshot(str(path)) == ([], {}, {}, {})
+
+
+def test_truncated_after_header(tmp_path):
+    path = tmp_path / "session.snap"
+    path.write_bytes(_save(path)[:16])
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+
+
+@pytest.mark.parametrize("size", [3, 40, 200])
+def test_truncated_file(tmp_path, size):
+    path = tmp_path / "session.snap"
+    path.write_bytes(_save(path)[:size])
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+
+
+@pytest.mark.parametrize("section", [b"columns", b"tagnames", b"tagrows", b"tagoffs", b"histrows"])
+def test_out_of_range_index(tmp_path, section):
+    path = tmp_path / "session.snap"
+    data = bytearray(_save(path))
+    offset, _ = _section(data, section)
+    data[offset:offset + 4] = array('I', [10 ** 6]).tobytes()
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+
+
+def test_bad_magic(tmp_path):
+    path = tmp_path / "session.snap"
+    path.write_bytes(b"NOTASNAP" + _save(path)[8:])
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+
+
+def test_corrupt_meta(tmp_path):
+    path = tmp_path / "session.snap"
+    data = bytearray(_save(path))
+    offset, length = _section(data, b"meta")
+    data[offset:offset + length] = b"\xff" * length
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+
+
+def test_state_not_a_dict(tmp_path):
+    path = tmp_path / "session.snap"
+    save_snapshot(str(path), ARTICLES, build_tag_index(ARTICLES), ["не", "словарь"])
+
+    assert load_snapshot(str(path))[2] == {}
+
+
+def test_history_values_clamped_to_int32(tmp_path):
+    path = tmp_path / "session.snap"
+    history = {"https://habr.com/1": [(1.5, 10 ** 12, -10 ** 12)]}
+    save_snapshot(str(path), ARTICLES, build_tag_index(ARTICLES), {}, history)
+
+    assert load_snapshot(str(path))[3] == {"https://habr.com/1": [(1.5, 2 ** 31 - 1, -2 ** 31)]}
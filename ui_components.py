@@ -1,7 +1,8 @@
 from PyQt5.QtWidgets import (QTableWidgetItem, QDialog, QDialogButtonBox, 
-                            QCalendarWidget, QVBoxLayout)
-from PyQt5.QtCore import Qt
-import webbrowser
+                            QCalendarWidget, QVBoxLayout, QTabWidget, QTableWidget,
+                            QHeaderView, QLabel)
+from PyQt5.QtCore import Qt, pyqtSignal, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QColor
 
 class DatePickerDialog(QDialog):
     def __init__(self, parent=None):
@@ -25,12 +26,123 @@ class DatePickerDialog(QDialog):
     def selected_date(self):
         return self.calendar.selectedDate()
 
-class ClickableTableWidgetItem(QTableWidgetItem):
-    def __init__(self, text, link):
-        super().__init__(text)
-        self.link = link
-        self.setForeground(Qt.blue)
-        self.setFlags(self.flags() | Qt.ItemIsEnabled)
+class ArticlesTableModel(QAbstractTableModel):
+    HEADERS = ["Дата", "Заголовок", "Ссылка", "Автор", "Рейтинг", "Комментарии", "Теги", "Краткое содержание"]
+    LINK_COLUMN = 2
+    DESCRIPTION_COLUMN = 7
+    CHANGED_ROW_COLOR = QColor("#fff3c4")
 
-    def open_link(self):
-        webbrowser.open(self.link)
\ No newline at end of file
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.articles = []
+        # Номера статей в порядке отображения (результат фильтра и сортировки)
+        self.rows = []
+        self.highlighted_links = set()
+
+    def set_rows(self, articles, rows):
+        # Видимый набор строк меняется одним сбросом модели
+        self.beginResetModel()
+        self.articles = articles
+        self.rows = rows
+        self.endResetModel()
+
+    def set_highlighted(self, links):
+        self.highlighted_links = links
+        if len(self.rows):
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.rows) - 1, len(self.HEADERS) - 1))
+
+    def article(self, row):
+        return self.articles[self.rows[row]]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def display_text(self, article, col):
+        if col == 0:
+            date = article[0]
+            return f"{date[8:10]}.{date[5:7]}.{date[:4]}"
+        if col == 6:
+            return ', '.join(t.strip() for t in article[6].split(','))
+        if col == self.DESCRIPTION_COLUMN:
+            full_desc = article[7]
+            return (full_desc[:150] + '...') if len(full_desc) > 150 else full_desc
+        return article[col]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        article = self.article(index.row())
+        col = index.column()
+
+        if role == Qt.DisplayRole:
+            return self.display_text(article, col)
+        if role == Qt.ToolTipRole and col in (1, 6, self.DESCRIPTION_COLUMN):
+            return article[7] if col == self.DESCRIPTION_COLUMN else self.display_text(article, col)
+        if role == Qt.TextAlignmentRole and col in (4, 5):
+            return int(Qt.AlignCenter)
+        if role == Qt.ForegroundRole and col == self.LINK_COLUMN:
+            return QColor(Qt.blue)
+        if role == Qt.BackgroundRole and article[2] in self.highlighted_links:
+            return self.CHANGED_ROW_COLOR
+        if role == Qt.UserRole:
+            return article[7] if col == self.DESCRIPTION_COLUMN else article[col]
+        return None
+
+class AnalyticsDialog(QDialog):
+    filter_requested = pyqtSignal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Аналитика")
+        self.resize(900, 700)
+
+        layout = QVBoxLayout()
+        self.status_label = QLabel("Расчёт...")
+        self.tabs = QTabWidget()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        buttons.rejected.connect(self.reject)
+
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.tabs)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+    def set_tables(self, tables):
+        self.tabs.clear()
+        for title, headers, rows, filters in tables:
+            table = QTableWidget(len(rows), len(headers))
+            table.setHorizontalHeaderLabels(headers)
+            table.setEditTriggers(QTableWidget.NoEditTriggers)
+            table.setSelectionBehavior(QTableWidget.SelectRows)
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+            table.horizontalHeader().setStretchLastSection(True)
+
+            for row, values in enumerate(rows):
+                for col, value in enumerate(values):
+                    item = QTableWidgetItem()
+                    # Числа кладём как данные, чтобы сортировка по столбцу была числовой
+                    item.setData(Qt.DisplayRole, value)
+                    item.setData(Qt.UserRole, filters[row])
+                    table.setItem(row, col, item)
+
+            table.setSortingEnabled(True)
+            table.cellClicked.connect(lambda row, col, t=table: self.on_cell_clicked(t, row, col))
+            self.tabs.addTab(table, title)
+
+        self.status_label.setText("Нажмите на строку, чтобы отфильтровать статьи")
+
+    def on_cell_clicked(self, table, row, col):
+        item = table.item(row, col)
+        if item:
+            kind, value = item.data(Qt.UserRole)
+            self.filter_requested.emit(kind, value)